@@ -19,14 +19,26 @@ Usage:
 """
 
 import json
+import os
 import sys
 import re
-import copy
+import io
 import argparse
+import contextlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
 
-def clean_notebook(source_path, target_path, verbose=False):
+# Slideshow slide types whose cells are removed from the student version
+SKIPPED_SLIDE_TYPES = frozenset({'notes', 'skip'})
+
+# Notebook-level metadata keys kept in the student version, in output order
+ESSENTIAL_METADATA_KEYS = ('kernelspec', 'language_info', 'nbformat', 'nbformat_minor')
+
+
+def clean_notebook(source_path, target_path, verbose=False, create_parent=True):
     """
     Process a Jupyter notebook according to specified cleaning rules.
     
@@ -34,46 +46,68 @@ def clean_notebook(source_path, target_path, verbose=False):
         source_path (Path): Path to the source notebook
         target_path (Path): Path where the cleaned notebook will be saved
         verbose (bool): Whether to display detailed processing information
+        create_parent (bool): Whether to create the target's parent directory if needed
     """
     if verbose:
         print(f"Processing: {source_path} -> {target_path}")
     
     try:
-        with source_path.open('r', encoding='utf-8') as f:
-            notebook = json.load(f)
+        notebook = json.loads(source_path.read_bytes())
     except Exception as e:
         print(f"Error loading notebook {source_path}: {e}")
         sys.exit(1)
     
-    # Create a deep copy to avoid modifying the original while iterating
-    cleaned_notebook = copy.deepcopy(notebook)
-    
-    # Clean notebook metadata
-    clean_metadata(cleaned_notebook)
+    # Clean notebook metadata (the parsed notebook is ours, so modify it in place)
+    clean_metadata(notebook)
     if verbose:
         print("  Cleaned metadata")
     
     # Process cells
-    original_cell_count = len(cleaned_notebook['cells'])
-    cleaned_notebook['cells'] = process_cells(cleaned_notebook['cells'], verbose)
-    final_cell_count = len(cleaned_notebook['cells'])
+    original_cell_count = len(notebook['cells'])
+    notebook['cells'] = process_cells(notebook['cells'], verbose)
+    final_cell_count = len(notebook['cells'])
     
     if verbose:
         print(f"  Removed {original_cell_count - final_cell_count} cells")
     
+    cleaned_content = json.dumps(notebook, indent=1)
+    
+    # Leave the target untouched if it is already up to date, e.g. when a
+    # commit only changed other notebooks in the same folder
+    if target_is_up_to_date(target_path, cleaned_content):
+        print(f"Already up to date: {target_path}")
+        return
+    
     # Create parent directory if it doesn't exist
-    target_path.parent.mkdir(parents=True, exist_ok=True)
+    if create_parent:
+        target_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Save the cleaned notebook
+    # Save the cleaned notebook in a single write
     try:
-        with target_path.open('w', encoding='utf-8') as f:
-            json.dump(cleaned_notebook, f, indent=1)
+        target_path.write_text(cleaned_content, encoding='utf-8')
         print(f"Successfully created: {target_path}")
     except Exception as e:
         print(f"Error saving notebook {target_path}: {e}")
         sys.exit(1)
 
 
+def target_is_up_to_date(target_path, content):
+    """
+    Check whether the target notebook already contains exactly the given content.
+    
+    Args:
+        target_path (Path): Path where the cleaned notebook will be saved
+        content (str): Serialised cleaned notebook
+        
+    Returns:
+        bool: True if the target exists with identical content, False otherwise
+    """
+    try:
+        return target_path.read_text(encoding='utf-8') == content
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
 def clean_metadata(notebook):
     """
     Remove unnecessary metadata from the notebook.
@@ -82,45 +116,51 @@ def clean_metadata(notebook):
         notebook (dict): The notebook object
     """
     # Keep only essential metadata
-    essential_keys = ['kernelspec', 'language_info', 'nbformat', 'nbformat_minor']
-    if 'metadata' in notebook:
-        cleaned_metadata = {k: notebook['metadata'][k] for k in essential_keys if k in notebook['metadata']}
-        notebook['metadata'] = cleaned_metadata
+    metadata = notebook.get('metadata')
+    if metadata is not None:
+        notebook['metadata'] = {k: metadata[k] for k in ESSENTIAL_METADATA_KEYS if k in metadata}
 
 
 def process_cells(cells, verbose=False):
     """
     Process all cells in the notebook according to the rules.
     
+    The list is filtered in place, so no second list of cells is built.
+    
     Args:
         cells (list): List of cell dictionaries
         verbose (bool): Whether to display detailed processing information
         
     Returns:
-        list: Processed cells
+        list: Processed cells (the same list object that was passed in)
     """
-    cleaned_cells = []
+    kept_cells = 0
     removed_cells = 0
     processed_code_cells = 0
     markdown_cells_locked = 0
     
     for cell in cells:
+        metadata = cell.get('metadata')
+        
         # Skip cells with slideshow slide type "notes" or "skip"
-        if should_skip_cell(cell):
+        slide_type = get_slide_type(metadata)
+        if slide_type in SKIPPED_SLIDE_TYPES:
             removed_cells += 1
             if verbose:
-                print(f"  Skipping cell with slide type: {cell['metadata'].get('slideshow', {}).get('slide_type', 'unknown')}")
+                print(f"  Skipping cell with slide type: {slide_type}")
             continue
         
+        cell_type = cell['cell_type']
+        
         # Make markdown cells non-editable
-        if cell['cell_type'] == 'markdown':
-            if 'metadata' not in cell:
-                cell['metadata'] = {}
-            cell['metadata']['editable'] = False
+        if cell_type == 'markdown':
+            if metadata is None:
+                metadata = cell['metadata'] = {}
+            metadata['editable'] = False
             markdown_cells_locked += 1
         
         # Remove execution count for code cells
-        if cell['cell_type'] == 'code':
+        elif cell_type == 'code':
             cell['execution_count'] = None
             
             # Remove outputs
@@ -131,19 +171,22 @@ def process_cells(cells, verbose=False):
                 print(f"  Removed {output_count} outputs from code cell")
             
             # Process "remove_code" metadata if present
-            if 'metadata' in cell and 'remove_code' in cell['metadata']:
+            if metadata is not None and 'remove_code' in metadata:
                 process_remove_code(cell, verbose)
                 processed_code_cells += 1
                 
-        # Add the processed cell to our list
-        cleaned_cells.append(cell)
+        # Move the processed cell down over any removed ones
+        cells[kept_cells] = cell
+        kept_cells += 1
+    
+    del cells[kept_cells:]
     
     if verbose:
         print(f"  Processed {processed_code_cells} code cells with 'remove_code' metadata")
         print(f"  Made {markdown_cells_locked} markdown cells non-editable")
         print(f"  Removed {removed_cells} cells with 'notes' or 'skip' slide type")
     
-    return cleaned_cells
+    return cells
 
 
 def should_skip_cell(cell):
@@ -156,11 +199,22 @@ def should_skip_cell(cell):
     Returns:
         bool: True if the cell should be skipped, False otherwise
     """
-    if 'metadata' in cell and 'slideshow' in cell['metadata']:
-        slide_type = cell['metadata']['slideshow'].get('slide_type', '')
-        if slide_type in ['notes', 'skip']:
-            return True
-    return False
+    return get_slide_type(cell.get('metadata')) in SKIPPED_SLIDE_TYPES
+
+
+def get_slide_type(metadata):
+    """
+    Get the slideshow slide type from a cell's metadata.
+    
+    Args:
+        metadata (dict): Cell metadata dictionary, or None if the cell has none
+        
+    Returns:
+        str: The slide type, or an empty string if none is set
+    """
+    if not metadata or 'slideshow' not in metadata:
+        return ''
+    return metadata['slideshow'].get('slide_type', '')
 
 
 def process_remove_code(cell, verbose=False):
@@ -173,27 +227,40 @@ def process_remove_code(cell, verbose=False):
     """
     remove_code_value = cell['metadata']['remove_code']
     
-    # Handle source being either a string or a list of strings
-    if isinstance(cell['source'], list):
-        source_lines = cell['source']
-    else:
-        source_lines = cell['source'].splitlines()
-    
     if verbose:
         print(f"  Processing code removal with mode: {remove_code_value}")
     
-    if remove_code_value == "non-comments":
-        cell['source'] = process_non_comments(source_lines, verbose)
-    elif remove_code_value == "all":
+    # Split off the argument of "after:<comment>" once, up front
+    mode, separator, comment_marker = remove_code_value.partition(":")
+    
+    if remove_code_value == "all":
+        # The original source is not needed, so don't bother splitting it
         cell['source'] = ["\n"]
-    elif remove_code_value.startswith("after:"):
-        comment_marker = remove_code_value[6:].strip()  # Extract the comment after "after:"
-        cell['source'] = process_after_comment(source_lines, comment_marker, verbose)
+    elif remove_code_value == "non-comments":
+        cell['source'] = process_non_comments(get_source_lines(cell), verbose)
+    elif mode == "after" and separator:
+        cell['source'] = process_after_comment(get_source_lines(cell), comment_marker.strip(), verbose)
     else:
         if verbose:
             print(f"  Unknown remove_code value: {remove_code_value}, leaving cell unchanged")
 
 
+def get_source_lines(cell):
+    """
+    Get the source of a cell as a list of lines.
+    
+    Args:
+        cell (dict): Cell dictionary
+        
+    Returns:
+        list: Source code lines
+    """
+    # Handle source being either a string or a list of strings
+    if isinstance(cell['source'], list):
+        return cell['source']
+    return cell['source'].splitlines()
+
+
 def process_non_comments(source_lines, verbose=False):
     """
     Remove all non-comment code lines but preserve single newlines between comments.
@@ -247,65 +314,119 @@ def process_after_comment(source_lines, comment_marker, verbose=False):
     prev_was_comment = False
     non_comment_lines_removed = 0
     
-    # Check if the comment marker appears exactly once
-    comment_occurrences = 0
+    # Rewrite the cell and check that the marker appears exactly once in the same pass
     for line in source_lines:
-        if line.strip() == comment_marker:
-            comment_occurrences += 1
+        stripped = line.strip()
+        
+        if stripped == comment_marker:
+            if remove_mode:
+                error_msg = f"ERROR: Comment marker '{comment_marker}' appears multiple times in cell"
+                print(error_msg)
+                error_line = f"# {error_msg}"
+                return [error_line] + source_lines
+            result.append(line)
+            remove_mode = True
+            prev_was_comment = True
+        elif not remove_mode:
+            result.append(line)
+        elif stripped.startswith('#'):
+            # Add a newline between comments if needed
+            if not prev_was_comment and len(result) > 0 and result[-1].strip():
+                result.append('\n')
+            result.append(line)
+            prev_was_comment = True
+        else:
+            if stripped:  # Only count non-empty lines
+                non_comment_lines_removed += 1
+            prev_was_comment = False
     
-    if comment_occurrences == 0:
+    if not remove_mode:
         error_msg = f"ERROR: Comment marker '{comment_marker}' not found in cell"
         print(error_msg)
         error_line = f"# {error_msg}"
         return [error_line] + source_lines
     
-    if comment_occurrences > 1:
-        error_msg = f"ERROR: Comment marker '{comment_marker}' appears multiple times in cell"
-        print(error_msg)
-        error_line = f"# {error_msg}"
-        return [error_line] + source_lines
-    
-    for line in source_lines:
-        stripped = line.strip()
-        is_comment = stripped.startswith('#')
-        
-        if not remove_mode:
-            result.append(line)
-            if stripped == comment_marker:
-                remove_mode = True
-                prev_was_comment = True
-        else:
-            if is_comment:
-                # Add a newline between comments if needed
-                if not prev_was_comment and len(result) > 0 and result[-1].strip():
-                    result.append('\n')
-                result.append(line)
-                prev_was_comment = True
-            else:
-                if stripped:  # Only count non-empty lines
-                    non_comment_lines_removed += 1
-                prev_was_comment = False
-    
     if verbose:
         print(f"  Removed {non_comment_lines_removed} non-comment lines after marker")
     
     return result
 
 
-def process_folder(source_folder, target_folder, verbose=False):
+def clean_notebook_into_folder(notebook_path, target_folder, verbose=False):
+    """
+    Clean a single notebook into the target folder, keeping its filename.
+    
+    Args:
+        notebook_path (Path): Path to the source notebook
+        target_folder (Path): Existing folder where the cleaned notebook will be saved
+        verbose (bool): Whether to display detailed processing information
+    """
+    # Get the target path with same filename
+    target_path = target_folder / notebook_path.name
+    
+    if verbose:
+        print(f"\nProcessing: {notebook_path.name}")
+    
+    # process_folder has already created the target folder
+    clean_notebook(notebook_path, target_path, verbose, create_parent=False)
+
+
+def clean_notebook_into_folder_captured(notebook_path, target_folder, verbose=False):
+    """
+    Clean a single notebook into the target folder in a parallel worker.
+    
+    The notebook's messages are captured instead of printed, so that the output
+    of parallel workers can be printed one notebook at a time without mixing.
+    
+    Args:
+        notebook_path (Path): Path to the source notebook
+        target_folder (Path): Existing folder where the cleaned notebook will be saved
+        verbose (bool): Whether to display detailed processing information
+        
+    Returns:
+        tuple: The captured output (str) and the exit status (0 on success)
+    """
+    output = io.StringIO()
+    status = 0
+    with contextlib.redirect_stdout(output):
+        try:
+            clean_notebook_into_folder(notebook_path, target_folder, verbose)
+        except SystemExit as e:
+            # Report the failure to the caller along with the error message
+            status = e.code
+        except BaseException:
+            # Keep any ERROR lines printed so far and add the traceback after them
+            output.write(traceback.format_exc())
+            status = 1
+    
+    return output.getvalue(), status
+
+
+def process_folder(source_folder, target_folder, verbose=False, jobs=1):
     """
     Process all notebooks in the source folder and output them to the target folder.
     
+    A notebook that fails to load or save does not stop the others: every
+    notebook is processed and reported, then the run exits with the status of
+    the first failure. This is the same with and without parallel workers.
+    
     Args:
         source_folder (Path): Path to the source folder containing notebooks
         target_folder (Path): Path where the cleaned notebooks will be saved
         verbose (bool): Whether to display detailed processing information
+        jobs (int): Number of notebooks to process in parallel worker processes
+            (0 uses one worker per CPU)
     """
+    if jobs < 0:
+        raise ValueError(f"jobs must be 0 or greater, got {jobs}")
+    
     # Create the target folder if it doesn't exist
     target_folder.mkdir(parents=True, exist_ok=True)
     
     # Find all Jupyter notebooks in the source folder
-    notebook_paths = list(source_folder.glob("*.ipynb"))
+    with os.scandir(source_folder) as entries:
+        notebook_paths = [Path(entry.path) for entry in entries
+                          if entry.name.endswith(".ipynb") and entry.is_file()]
     
     if not notebook_paths:
         print(f"No notebooks found in {source_folder}")
@@ -313,18 +434,51 @@ def process_folder(source_folder, target_folder, verbose=False):
     
     print(f"Found {len(notebook_paths)} notebooks to process.")
     
-    for notebook_path in notebook_paths:
-        # Get the target path with same filename
-        target_path = target_folder / notebook_path.name
-        
-        if verbose:
-            print(f"\nProcessing: {notebook_path.name}")
-        
-        clean_notebook(notebook_path, target_path, verbose)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    
+    exit_status = 0
+    if jobs > 1 and len(notebook_paths) > 1:
+        # Notebooks are independent, so hand them out to a pool of processes,
+        # in chunks so that large folders don't pay one round trip per notebook
+        chunksize = max(1, len(notebook_paths) // (4 * jobs))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # map yields results in notebook order, so output stays in order too
+            for output, status in executor.map(clean_notebook_into_folder_captured, notebook_paths,
+                                               repeat(target_folder), repeat(verbose),
+                                               chunksize=chunksize):
+                print(output, end="")
+                exit_status = exit_status or status
+    else:
+        # Print directly, so nothing is lost if cleaning a notebook crashes
+        for notebook_path in notebook_paths:
+            try:
+                clean_notebook_into_folder(notebook_path, target_folder, verbose)
+            except SystemExit as e:
+                exit_status = exit_status or e.code
+    
+    if exit_status:
+        sys.exit(exit_status)
     
     print(f"\nAll notebooks have been processed and saved to {target_folder}")
 
 
+def non_negative_int(value):
+    """
+    Parse a command line value that must be a whole number of 0 or more.
+    
+    Args:
+        value (str): The value given on the command line
+        
+    Returns:
+        int: The parsed value
+    """
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or greater, got {value}")
+    return number
+
+
 def main():
     """Main function to run the script with argparse."""
     parser = argparse.ArgumentParser(
@@ -337,6 +491,9 @@ Examples:
     
   Process all notebooks in a folder:
     python notebook_cleaner.py --source notebooks_folder --target student_notebooks_folder
+    
+  Process a folder using four parallel worker processes:
+    python notebook_cleaner.py --source notebooks_folder --target student_notebooks_folder --jobs 4
         """
     )
     
@@ -360,6 +517,13 @@ Examples:
         help="Display detailed processing information"
     )
     
+    parser.add_argument(
+        "--jobs", "-j", 
+        type=non_negative_int,
+        default=1,
+        help="Number of notebooks to process in parallel when the source is a folder; 0 uses all CPUs (default: 1)"
+    )
+    
     args = parser.parse_args()
     
     source_path = args.source
@@ -371,7 +535,7 @@ Examples:
         if not target_path.is_dir() and target_path.exists():
             print(f"Error: {target_path} exists but is not a directory")
             sys.exit(1)
-        process_folder(source_path, target_path, verbose)
+        process_folder(source_path, target_path, verbose, args.jobs)
     else:
         clean_notebook(source_path, target_path, verbose)
 
@@ -5,22 +5,26 @@ This script installs the hook with paths from notebook_settings.json or command
 """
 
 import os
+import re
 import json
 import argparse
 import stat
+import subprocess
+from functools import lru_cache
 from pathlib import Path
 
+@lru_cache(maxsize=1)
+def get_repo_root():
+    """Get the repository root directory, asking git only once per run."""
+    return Path(subprocess.check_output(
+        ["git", "rev-parse", "--show-toplevel"], 
+        universal_newlines=True
+    ).strip())
+
 def get_default_settings():
     """Read settings from notebook_settings.json if available."""
     try:
-        # Get the repository root directory
-        import subprocess
-        repo_root = subprocess.check_output(
-            ["git", "rev-parse", "--show-toplevel"], 
-            universal_newlines=True
-        ).strip()
-        
-        settings_path = Path(repo_root) / "notebook_settings.json"
+        settings_path = get_repo_root() / "notebook_settings.json"
         
         if settings_path.exists():
             with open(settings_path, 'r') as f:
@@ -44,17 +48,12 @@ def setup_precommit_hook(source_path, target_path, verbose=False, additional_arg
     """
     # Get the repository root directory
     try:
-        import subprocess
-        repo_root = subprocess.check_output(
-            ["git", "rev-parse", "--show-toplevel"], 
-            universal_newlines=True
-        ).strip()
+        repo_root = get_repo_root()
     except subprocess.CalledProcessError:
         print("Error: Not a git repository.")
         return False
     
     # Paths
-    repo_root = Path(repo_root)
     submodule_dir = "common"
     submodule_dir = submodule_dir if (repo_root / submodule_dir).exists() else "common-tools"
     hooks_dir = repo_root / ".git" / "hooks"
@@ -83,11 +82,17 @@ def setup_precommit_hook(source_path, target_path, verbose=False, additional_arg
     verbose_flag = "--verbose" if verbose else ""
     additional_args = additional_args or ""
     
-    hook_content = template_content.replace("__SOURCE_PATH__", source_path)
-    hook_content = hook_content.replace("__TARGET_PATH__", target_path)
-    hook_content = hook_content.replace("__VERBOSE__", verbose_flag)
-    hook_content = hook_content.replace("__ADDITIONAL_ARGS__", additional_args)
-    hook_content = hook_content.replace("__COMMON_TOOLS_DIR__", submodule_dir)
+    placeholders = {
+        "__SOURCE_PATH__": source_path,
+        "__TARGET_PATH__": target_path,
+        "__VERBOSE__": verbose_flag,
+        "__ADDITIONAL_ARGS__": additional_args,
+        "__COMMON_TOOLS_DIR__": submodule_dir,
+    }
+    # Substitute all placeholders in a single pass over the template, so values
+    # that happen to contain a placeholder name are not substituted again
+    placeholder_pattern = re.compile("|".join(re.escape(name) for name in placeholders))
+    hook_content = placeholder_pattern.sub(lambda match: placeholders[match.group(0)], template_content)
     
     # Write the configured hook
     with open(hook_path, 'w') as f:
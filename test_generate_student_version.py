@@ -12,237 +12,231 @@ Tests all major functionalities including:
 
 import unittest
 import json
+import io
+import os
+import contextlib
 import tempfile
 import shutil
 from pathlib import Path
 import textwrap
 import sys
-import importlib.util
+from unittest import mock
 
-# Load the notebook_cleaner module from the script file
-def load_module_from_file(module_name, file_path):
-    spec = importlib.util.spec_from_file_location(module_name, file_path)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    return module
+# Import the notebook cleaner script, which lives next to this file
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import generate_student_version
 
 
-class TestJupyterCleaner(unittest.TestCase):
-    def setUp(self):
-        """
-        Set up temporary directories and files for testing.
-        """
-        # Create temporary directories
-        self.test_dir = Path(tempfile.mkdtemp())
-        self.source_dir = self.test_dir / "source"
-        self.target_dir = self.test_dir / "target"
-        self.source_dir.mkdir()
-        
-        # Path to the notebook cleaner script
-        script_path = Path(__file__).parent / "generate_student_version.py"
-        
-        # Load the module
-        self.cleaner = load_module_from_file("notebook_cleaner", script_path)
-        
-        # Create a test notebook
-        self.test_notebook = textwrap.dedent("""\
-            {
-             "cells": [
-              {
-               "cell_type": "markdown",
-               "id": "e3634715-4859-4761-a492-8921d659a6f8",
-               "metadata": {
-                "editable": true,
-                "slideshow": {
-                 "slide_type": "slide"
-                },
-                "tags": []
-               },
-               "source": [
-                "# Markdown heading\\n",
-                "## Section 2\\n",
-                "### Section 3\\n",
-                "#### Section 4\\n",
-                "\\n",
-                "This is some non-heading text"
-               ]
-              },
-              {
-               "cell_type": "code",
-               "execution_count": 1,
-               "id": "0ee03765-2723-4541-aaba-a859690eda25",
-               "metadata": {
-                "editable": true,
-                "slideshow": {
-                 "slide_type": ""
-                },
-                "tags": []
-               },
-               "outputs": [
-                {
-                 "name": "stdout",
-                 "output_type": "stream",
-                 "text": [
-                  "This is python code that should remain\\n"
-                 ]
-                }
-               ],
-               "source": [
-                "# This comment is here for testing\\n",
-                "print(\\"This is python code that should remain\\")"
-               ]
-              },
-              {
-               "cell_type": "code",
-               "execution_count": 2,
-               "id": "0c4a3e7c-da50-4b5a-88ae-acc5bd309e2c",
-               "metadata": {
-                "editable": true,
-                "remove_code": "non-comments",
-                "slideshow": {
-                 "slide_type": ""
-                },
-                "tags": []
-               },
-               "outputs": [
-                {
-                 "name": "stdout",
-                 "output_type": "stream",
-                 "text": [
-                  "I hope this edgecase is handled as well\\n"
-                 ]
-                }
-               ],
-               "source": [
-                "# In this cell we test the proper removal of code\\n",
-                "to_be_removed_var = 12\\n",
-                "\\n",
-                "# make sure indentations are handled\\n",
-                "def remove_this_function(something):\\n",
-                "    if something == \\"else\\":\\n",
-                "        return \\"something else\\"\\n",
-                "    else:\\n",
-                "        return \\"something\\"\\n",
-                "\\n",
-                "#Havenospaceincomment\\n",
-                "print(\\"I hope this edgecase is handled as well\\")"
-               ]
-              },
-              {
-               "cell_type": "code",
-               "execution_count": 3,
-               "id": "857eb524-3a03-42f0-b78a-68ebde4b2d40",
-               "metadata": {
-                "editable": true,
-                "remove_code": "after:# Start removing here",
-                "slideshow": {
-                 "slide_type": "slide"
-                },
-                "tags": []
-               },
-               "outputs": [
-                {
-                 "name": "stdout",
-                 "output_type": "stream",
-                 "text": [
-                  "This should be kept\\n",
-                  "This should be gone\\n",
-                  "This should be gone again\\n"
-                 ]
-                }
-               ],
-               "source": [
-                "# This is a test whether after works\\n",
-                "print(\\"This should be kept\\")\\n",
-                "\\n",
-                "# Start removing here\\n",
-                "print(\\"This should be gone\\")\\n",
-                "\\n",
-                "# This should be kept\\n",
-                "print(\\"This should be gone again\\")"
-               ]
-              },
-              {
-               "cell_type": "markdown",
-               "id": "88641903-752c-4e79-b4cc-f54cbaa413e3",
-               "metadata": {
-                "editable": true,
-                "slideshow": {
-                 "slide_type": "notes"
-                },
-                "tags": []
-               },
-               "source": [
-                "These notes should disappear"
-               ]
-              },
-              {
-               "cell_type": "code",
-               "execution_count": 4,
-               "id": "a28d43da-91d8-486d-a94d-b573fe79d348",
-               "metadata": {
-                "editable": true,
-                "slideshow": {
-                 "slide_type": "notes"
-                },
-                "tags": []
-               },
-               "outputs": [
-                {
-                 "name": "stdout",
-                 "output_type": "stream",
-                 "text": [
-                  "Goodbye\\n"
-                 ]
-                }
-               ],
-               "source": [
-                "# The same for this code note cell\\n",
-                "print(\\"Goodbye\\")"
-               ]
-              }
-             ],
-             "metadata": {
-              "kernelspec": {
-               "display_name": "Python 3 (ipykernel)",
-               "language": "python",
-               "name": "python3"
-              },
-              "language_info": {
-               "codemirror_mode": {
-                "name": "ipython",
-                "version": 3
-               },
-               "file_extension": ".py",
-               "mimetype": "text/x-python",
-               "name": "python",
-               "nbconvert_exporter": "python",
-               "pygments_lexer": "ipython3",
-               "version": "3.13.2"
-              },
-              "unused_metadata": "This should be removed"
-             },
-             "nbformat": 4,
-             "nbformat_minor": 5
-            }
-        """)
-        
-        # Write the test notebook to the source directory
-        self.notebook_path = self.source_dir / "test_notebook.ipynb"
-        with open(self.notebook_path, 'w', encoding='utf-8') as f:
-            f.write(self.test_notebook)
+# The test notebook, shared by all tests
+TEST_NOTEBOOK = textwrap.dedent("""\
+    {
+     "cells": [
+      {
+       "cell_type": "markdown",
+       "id": "e3634715-4859-4761-a492-8921d659a6f8",
+       "metadata": {
+        "editable": true,
+        "slideshow": {
+         "slide_type": "slide"
+        },
+        "tags": []
+       },
+       "source": [
+        "# Markdown heading\\n",
+        "## Section 2\\n",
+        "### Section 3\\n",
+        "#### Section 4\\n",
+        "\\n",
+        "This is some non-heading text"
+       ]
+      },
+      {
+       "cell_type": "code",
+       "execution_count": 1,
+       "id": "0ee03765-2723-4541-aaba-a859690eda25",
+       "metadata": {
+        "editable": true,
+        "slideshow": {
+         "slide_type": ""
+        },
+        "tags": []
+       },
+       "outputs": [
+        {
+         "name": "stdout",
+         "output_type": "stream",
+         "text": [
+          "This is python code that should remain\\n"
+         ]
+        }
+       ],
+       "source": [
+        "# This comment is here for testing\\n",
+        "print(\\"This is python code that should remain\\")"
+       ]
+      },
+      {
+       "cell_type": "code",
+       "execution_count": 2,
+       "id": "0c4a3e7c-da50-4b5a-88ae-acc5bd309e2c",
+       "metadata": {
+        "editable": true,
+        "remove_code": "non-comments",
+        "slideshow": {
+         "slide_type": ""
+        },
+        "tags": []
+       },
+       "outputs": [
+        {
+         "name": "stdout",
+         "output_type": "stream",
+         "text": [
+          "I hope this edgecase is handled as well\\n"
+         ]
+        }
+       ],
+       "source": [
+        "# In this cell we test the proper removal of code\\n",
+        "to_be_removed_var = 12\\n",
+        "\\n",
+        "# make sure indentations are handled\\n",
+        "def remove_this_function(something):\\n",
+        "    if something == \\"else\\":\\n",
+        "        return \\"something else\\"\\n",
+        "    else:\\n",
+        "        return \\"something\\"\\n",
+        "\\n",
+        "#Havenospaceincomment\\n",
+        "print(\\"I hope this edgecase is handled as well\\")"
+       ]
+      },
+      {
+       "cell_type": "code",
+       "execution_count": 3,
+       "id": "857eb524-3a03-42f0-b78a-68ebde4b2d40",
+       "metadata": {
+        "editable": true,
+        "remove_code": "after:# Start removing here",
+        "slideshow": {
+         "slide_type": "slide"
+        },
+        "tags": []
+       },
+       "outputs": [
+        {
+         "name": "stdout",
+         "output_type": "stream",
+         "text": [
+          "This should be kept\\n",
+          "This should be gone\\n",
+          "This should be gone again\\n"
+         ]
+        }
+       ],
+       "source": [
+        "# This is a test whether after works\\n",
+        "print(\\"This should be kept\\")\\n",
+        "\\n",
+        "# Start removing here\\n",
+        "print(\\"This should be gone\\")\\n",
+        "\\n",
+        "# This should be kept\\n",
+        "print(\\"This should be gone again\\")"
+       ]
+      },
+      {
+       "cell_type": "markdown",
+       "id": "88641903-752c-4e79-b4cc-f54cbaa413e3",
+       "metadata": {
+        "editable": true,
+        "slideshow": {
+         "slide_type": "notes"
+        },
+        "tags": []
+       },
+       "source": [
+        "These notes should disappear"
+       ]
+      },
+      {
+       "cell_type": "code",
+       "execution_count": 4,
+       "id": "a28d43da-91d8-486d-a94d-b573fe79d348",
+       "metadata": {
+        "editable": true,
+        "slideshow": {
+         "slide_type": "notes"
+        },
+        "tags": []
+       },
+       "outputs": [
+        {
+         "name": "stdout",
+         "output_type": "stream",
+         "text": [
+          "Goodbye\\n"
+         ]
+        }
+       ],
+       "source": [
+        "# The same for this code note cell\\n",
+        "print(\\"Goodbye\\")"
+       ]
+      }
+     ],
+     "metadata": {
+      "kernelspec": {
+       "display_name": "Python 3 (ipykernel)",
+       "language": "python",
+       "name": "python3"
+      },
+      "language_info": {
+       "codemirror_mode": {
+        "name": "ipython",
+        "version": 3
+       },
+       "file_extension": ".py",
+       "mimetype": "text/x-python",
+       "name": "python",
+       "nbconvert_exporter": "python",
+       "pygments_lexer": "ipython3",
+       "version": "3.13.2"
+      },
+      "unused_metadata": "This should be removed"
+     },
+     "nbformat": 4,
+     "nbformat_minor": 5
+    }
+""")
+
+
+class CleanerTestCase(unittest.TestCase):
+    """
+    Base class giving tests access to the cleaner module.
+    """
+    cleaner = generate_student_version
 
-    def tearDown(self):
+
+class TestJupyterCleanerLogic(CleanerTestCase):
+    """
+    Tests of the cleaning functions that work on in-memory notebook data.
+    """
+    @classmethod
+    def setUpClass(cls):
         """
-        Clean up temporary files and directories.
+        Parse the test notebook once for all tests.
         """
-        shutil.rmtree(self.test_dir)
+        super().setUpClass()
+        # Shared by read-only tests; tests that modify a notebook parse their own
+        cls._notebook_template = json.loads(TEST_NOTEBOOK)
 
     def test_clean_metadata(self):
         """
         Test that unnecessary metadata is removed.
         """
-        notebook = json.loads(self.test_notebook)
+        # clean_metadata modifies the notebook, so give it its own copy
+        notebook = json.loads(TEST_NOTEBOOK)
         self.cleaner.clean_metadata(notebook)
         
         # Check that essential metadata is preserved
@@ -256,7 +250,7 @@ class TestJupyterCleaner(unittest.TestCase):
         """
         Test that cells with slideshow type 'notes' or 'skip' are identified for skipping.
         """
-        notebook = json.loads(self.test_notebook)
+        notebook = self._notebook_template
         
         # The fifth cell has slideshow type 'notes'
         should_skip = self.cleaner.should_skip_cell(notebook['cells'][4])
@@ -266,6 +260,25 @@ class TestJupyterCleaner(unittest.TestCase):
         should_skip = self.cleaner.should_skip_cell(notebook['cells'][0])
         self.assertFalse(should_skip)
 
+    def test_process_cells_removes_cells_in_place(self):
+        """
+        Test that skipped cells before and between kept cells are removed in place.
+        """
+        cells = [
+            {"cell_type": "markdown", "metadata": {"slideshow": {"slide_type": "skip"}}, "source": ["skip me"]},
+            {"cell_type": "markdown", "metadata": {}, "source": ["first"]},
+            {"cell_type": "code", "metadata": {"slideshow": {"slide_type": "notes"}},
+             "source": ["notes"], "outputs": [], "execution_count": 1},
+            {"cell_type": "code", "metadata": {}, "source": ["second"], "outputs": [], "execution_count": 2},
+            {"cell_type": "markdown", "metadata": {}, "source": ["third"]}
+        ]
+        
+        processed = self.cleaner.process_cells(cells, verbose=False)
+        
+        # Check that the same list is returned, holding only the kept cells in order
+        self.assertIs(processed, cells)
+        self.assertEqual([cell['source'] for cell in processed], [["first"], ["second"], ["third"]])
+
     def test_process_non_comments(self):
         """
         Test removal of non-comment code while preserving comments.
@@ -298,34 +311,36 @@ class TestJupyterCleaner(unittest.TestCase):
         """
         Test removal of code after a specific comment.
         """
-        code_cell = [
-            "# First comment\n",
-            "keep_this_code = True\n",
-            "\n",
-            "# Start removing after this\n",
-            "remove_this_code = True\n",
-            "\n",
-            "# But keep this comment\n",
-            "also_remove_this = 42\n"
-        ]
-        
-        processed = self.cleaner.process_after_comment(
-            code_cell, 
-            "# Start removing after this", 
-            verbose=False
-        )
-        
-        # Expected: code before marker and all comments preserved
-        expected = [
-            "# First comment\n",
-            "keep_this_code = True\n",
-            "\n",
-            "# Start removing after this\n",
-            "\n",
-            "# But keep this comment\n"
-        ]
-        
-        self.assertEqual(processed, expected)
+        for marker in ("# Start removing after this", "# Start removing here"):
+            with self.subTest(marker=marker):
+                code_cell = [
+                    "# First comment\n",
+                    "keep_this_code = True\n",
+                    "\n",
+                    f"{marker}\n",
+                    "remove_this_code = True\n",
+                    "\n",
+                    "# But keep this comment\n",
+                    "also_remove_this = 42\n"
+                ]
+                
+                processed = self.cleaner.process_after_comment(
+                    code_cell, 
+                    marker, 
+                    verbose=False
+                )
+                
+                # Expected: code before marker and all comments preserved
+                expected = [
+                    "# First comment\n",
+                    "keep_this_code = True\n",
+                    "\n",
+                    f"{marker}\n",
+                    "\n",
+                    "# But keep this comment\n"
+                ]
+                
+                self.assertEqual(processed, expected)
 
     def test_process_all_code_removal(self):
         """
@@ -337,47 +352,85 @@ class TestJupyterCleaner(unittest.TestCase):
             "print('This will also be gone')\n"
         ]
         
-        # Manually call the processing logic that would happen in process_remove_code
-        # with "all" option
-        result = ["\n"]
+        cell = {
+            "cell_type": "code",
+            "metadata": {"remove_code": "all"},
+            "source": code_cell
+        }
+        
+        self.cleaner.process_remove_code(cell, verbose=False)
         
         # Check that only a newline remains
-        self.assertEqual(len(result), 1)
-        self.assertEqual(result[0], "\n")
+        self.assertEqual(cell['source'], ["\n"])
+
+    def test_process_after_code_removal(self):
+        """
+        Test that whitespace around the marker in an "after:" option is ignored.
+        """
+        cell = {
+            "cell_type": "code",
+            "metadata": {"remove_code": "after:  # marker "},
+            "source": ["kept = True\n", "# marker\n", "removed = True\n"]
+        }
         
-    def test_process_after_comment_with_spaces(self):
+        self.cleaner.process_remove_code(cell, verbose=False)
+        
+        self.assertEqual(cell['source'], ["kept = True\n", "# marker\n"])
+
+    def test_process_malformed_after_option(self):
         """
-        Test removal of code after a specific comment when there are spaces after 'after:'.
+        Test that "after" options without a ':' separator leave the cell unchanged.
         """
-        code_cell = [
-            "# First comment\n",
-            "keep_this_code = True\n",
-            "\n",
-            "# Start removing here\n",
-            "remove_this_code = True\n",
-            "\n",
-            "# But keep this comment\n",
-            "also_remove_this = 42\n"
-        ]
+        code_cell = ["kept = True\n", "# m\n", "also_kept = True\n"]
         
-        # Test with spaces after the 'after:' part
-        processed = self.cleaner.process_after_comment(
-            code_cell, 
-            "# Start removing here", 
-            verbose=False
-        )
+        for option in ("after", "afterx:# m"):
+            with self.subTest(option=option):
+                cell = {
+                    "cell_type": "code",
+                    "metadata": {"remove_code": option},
+                    "source": list(code_cell)
+                }
+                
+                self.cleaner.process_remove_code(cell, verbose=False)
+                
+                self.assertEqual(cell['source'], code_cell)
+
+
+class TestJupyterCleanerIO(CleanerTestCase):
+    """
+    Tests that read and write notebook files on disk.
+    """
+    @classmethod
+    def setUpClass(cls):
+        """
+        Encode the test notebook and create a temporary root once for all tests.
+        """
+        super().setUpClass()
+        cls._notebook_bytes = TEST_NOTEBOOK.encode('utf-8')
         
-        # Expected: code before marker and all comments preserved
-        expected = [
-            "# First comment\n",
-            "keep_this_code = True\n",
-            "\n",
-            "# Start removing here\n",
-            "\n",
-            "# But keep this comment\n"
-        ]
+        # One temporary root for the whole class; each test gets a subdirectory
+        cls._tmp_root = Path(tempfile.mkdtemp())
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Clean up temporary files and directories.
+        """
+        shutil.rmtree(cls._tmp_root)
+
+    def setUp(self):
+        """
+        Set up temporary directories and files for testing.
+        """
+        # Create temporary directories
+        self.test_dir = self._tmp_root / self._testMethodName
+        self.source_dir = self.test_dir / "source"
+        self.target_dir = self.test_dir / "target"
+        self.source_dir.mkdir(parents=True)
         
-        self.assertEqual(processed, expected)
+        # Write the test notebook to the source directory
+        self.notebook_path = self.source_dir / "test_notebook.ipynb"
+        self.notebook_path.write_bytes(self._notebook_bytes)
 
     def test_clean_notebook_file(self):
         """
@@ -392,20 +445,16 @@ class TestJupyterCleaner(unittest.TestCase):
         self.assertTrue(output_path.exists())
         
         # Load the cleaned notebook
-        with output_path.open('r', encoding='utf-8') as f:
-            cleaned = json.load(f)
+        cleaned = json.loads(output_path.read_bytes())
         
         # Check that there are only 4 cells (2 should be removed due to 'notes' slide type)
         self.assertEqual(len(cleaned['cells']), 4)
         
-        # Check that markdown cells are not editable
+        # Check that markdown cells are not editable and code cells have no outputs
         for cell in cleaned['cells']:
             if cell['cell_type'] == 'markdown':
                 self.assertFalse(cell['metadata']['editable'])
-        
-        # Check that code cells have no outputs
-        for cell in cleaned['cells']:
-            if cell['cell_type'] == 'code':
+            elif cell['cell_type'] == 'code':
                 self.assertEqual(len(cell['outputs']), 0)
                 self.assertIsNone(cell['execution_count'])
         
@@ -426,14 +475,73 @@ class TestJupyterCleaner(unittest.TestCase):
         self.assertNotIn('print("This should be gone")', all_content)
         self.assertNotIn('print("This should be gone again")', all_content)
 
+    def clean_quietly(self, target_path):
+        """
+        Run clean_notebook on the test notebook and return what it printed.
+        """
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.cleaner.clean_notebook(self.notebook_path, target_path, verbose=False)
+        return output.getvalue()
+
+    def test_unchanged_target_not_rewritten(self):
+        """
+        Test that cleaning into an up-to-date target leaves the file untouched.
+        """
+        output_path = self.target_dir / "output_notebook.ipynb"
+        self.clean_quietly(output_path)
+        
+        # Backdate the target so any rewrite would be visible in its mtime
+        old_mtime_ns = output_path.stat().st_mtime_ns - 10**9
+        os.utime(output_path, ns=(old_mtime_ns, old_mtime_ns))
+        
+        printed = self.clean_quietly(output_path)
+        
+        self.assertIn("Already up to date", printed)
+        self.assertEqual(output_path.stat().st_mtime_ns, old_mtime_ns)
+
+    def test_edited_target_rewritten(self):
+        """
+        Test that a hand-edited target is regenerated.
+        """
+        output_path = self.target_dir / "output_notebook.ipynb"
+        self.clean_quietly(output_path)
+        expected = output_path.read_bytes()
+        
+        output_path.write_text('{"edited": "by hand"}', encoding='utf-8')
+        printed = self.clean_quietly(output_path)
+        
+        self.assertIn("Successfully created", printed)
+        self.assertEqual(output_path.read_bytes(), expected)
+
+    def test_missing_or_directory_target(self):
+        """
+        Test that a missing target is written and a directory target is an error.
+        """
+        # A missing target falls through to the normal write
+        output_path = self.target_dir / "missing" / "output_notebook.ipynb"
+        printed = self.clean_quietly(output_path)
+        self.assertIn("Successfully created", printed)
+        self.assertTrue(output_path.is_file())
+        
+        # A target that is a directory is not up to date, and cannot be written
+        directory_target = self.target_dir / "directory.ipynb"
+        directory_target.mkdir()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            with self.assertRaises(SystemExit) as raised:
+                self.cleaner.clean_notebook(self.notebook_path, directory_target, verbose=False)
+        self.assertEqual(raised.exception.code, 1)
+        self.assertNotIn("Already up to date", output.getvalue())
+        self.assertIn("Error saving notebook", output.getvalue())
+
     def test_process_folder(self):
         """
         Test processing all notebooks in a folder.
         """
         # Create a second test notebook
         second_notebook_path = self.source_dir / "second_notebook.ipynb"
-        with open(second_notebook_path, 'w', encoding='utf-8') as f:
-            f.write(self.test_notebook)  # Using the same content for simplicity
+        second_notebook_path.write_bytes(self._notebook_bytes)  # Using the same content for simplicity
         
         # Process the folder
         self.cleaner.process_folder(self.source_dir, self.target_dir, verbose=False)
@@ -442,6 +550,125 @@ class TestJupyterCleaner(unittest.TestCase):
         self.assertTrue((self.target_dir / "test_notebook.ipynb").exists())
         self.assertTrue((self.target_dir / "second_notebook.ipynb").exists())
 
+    def assert_parallel_matches_serial(self, jobs):
+        """
+        Process the source folder in parallel and check it matches a serial run.
+        """
+        # Create a second test notebook so there is work for more than one worker
+        second_notebook_path = self.source_dir / "second_notebook.ipynb"
+        second_notebook_path.write_bytes(self._notebook_bytes)
+        serial_dir = self.test_dir / "serial"
+        
+        self.cleaner.process_folder(self.source_dir, serial_dir, verbose=False)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.cleaner.process_folder(self.source_dir, self.target_dir, verbose=True, jobs=jobs)
+        
+        # Check that both outputs exist and match the serial run
+        for name in ("test_notebook.ipynb", "second_notebook.ipynb"):
+            self.assertTrue((self.target_dir / name).exists())
+            self.assertEqual((self.target_dir / name).read_bytes(), (serial_dir / name).read_bytes())
+        
+        # Check that each worker's messages were printed as whole lines
+        created_lines = [line for line in output.getvalue().splitlines() if "Successfully created" in line]
+        self.assertEqual(len(created_lines), 2)
+        for line in created_lines:
+            self.assertTrue(line.startswith("Successfully created: "))
+            self.assertTrue(line.endswith(".ipynb"))
+
+    def test_process_folder_parallel(self):
+        """
+        Test processing a folder with two parallel worker processes.
+        """
+        self.assert_parallel_matches_serial(jobs=2)
+
+    def write_crashing_notebook(self):
+        """
+        Write a notebook that reports an ERROR line and then makes the cleaner crash.
+        """
+        notebook = {
+            "cells": [
+                {"cell_type": "code", "metadata": {"remove_code": "after:# nope"},
+                 "source": ["x = 1\n"], "outputs": [], "execution_count": None},
+                {"cell_type": "code", "metadata": {"remove_code": 5},
+                 "source": ["y = 2\n"], "outputs": [], "execution_count": None}
+            ],
+            "metadata": {},
+            "nbformat": 4,
+            "nbformat_minor": 5
+        }
+        (self.source_dir / "crashing_notebook.ipynb").write_text(json.dumps(notebook), encoding='utf-8')
+
+    def test_process_folder_crash_keeps_errors(self):
+        """
+        Test that ERROR lines printed before a crash are not lost, serially or in parallel.
+        """
+        self.write_crashing_notebook()
+        
+        # Serially the crash propagates, after the ERROR line has been printed
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            with self.assertRaises(AttributeError):
+                self.cleaner.process_folder(self.source_dir, self.test_dir / "serial", verbose=False)
+        self.assertIn("ERROR: Comment marker '# nope' not found in cell", output.getvalue())
+        
+        # In parallel the worker reports the traceback along with the ERROR line
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            with self.assertRaises(SystemExit) as raised:
+                self.cleaner.process_folder(self.source_dir, self.target_dir, verbose=False, jobs=2)
+        self.assertEqual(raised.exception.code, 1)
+        self.assertIn("ERROR: Comment marker '# nope' not found in cell", output.getvalue())
+        self.assertIn("AttributeError", output.getvalue())
+
+    def test_process_folder_invalid_notebook(self):
+        """
+        Test that an invalid notebook fails the run but every other notebook is written and reported.
+        """
+        (self.source_dir / "invalid_notebook.ipynb").write_text("{not json", encoding='utf-8')
+        good_names = ["test_notebook.ipynb", "second_notebook.ipynb", "third_notebook.ipynb"]
+        for name in good_names[1:]:
+            (self.source_dir / name).write_bytes(self._notebook_bytes)
+        
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                target_dir = self.test_dir / f"target_jobs_{jobs}"
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    with self.assertRaises(SystemExit) as raised:
+                        self.cleaner.process_folder(self.source_dir, target_dir, verbose=False, jobs=jobs)
+                
+                self.assertEqual(raised.exception.code, 1)
+                self.assertIn("Error loading notebook", output.getvalue())
+                self.assertFalse((target_dir / "invalid_notebook.ipynb").exists())
+                for name in good_names:
+                    self.assertTrue((target_dir / name).exists())
+                    self.assertIn(f"Successfully created: {target_dir / name}", output.getvalue())
+
+    def test_process_folder_all_cpus(self):
+        """
+        Test processing a folder with jobs=0, which uses one worker per CPU.
+        """
+        self.assert_parallel_matches_serial(jobs=0)
+
+    def test_negative_jobs_rejected(self):
+        """
+        Test that a negative number of jobs is rejected rather than run serially.
+        """
+        with self.assertRaises(ValueError):
+            self.cleaner.process_folder(self.source_dir, self.target_dir, jobs=-1)
+        
+        # The command line rejects it with a usage error before processing anything
+        argv = ["generate_student_version.py", "--source", str(self.source_dir),
+                "--target", str(self.target_dir), "--jobs", "-5"]
+        with mock.patch.object(sys, "argv", argv), \
+                contextlib.redirect_stderr(io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as raised:
+                self.cleaner.main()
+        self.assertEqual(raised.exception.code, 2)
+        self.assertIn("must be 0 or greater", stderr.getvalue())
+        self.assertFalse(self.target_dir.exists())
+
 
 # Run the tests if this file is executed directly
 if __name__ == "__main__":